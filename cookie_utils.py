@@ -0,0 +1,22 @@
+"""
+Shared helpers for the cookie setup and test scripts
+"""
+
+import os
+
+def present_files(directory):
+    """Return the names of all entries in directory using a single scan"""
+    with os.scandir(directory) as entries:
+        return {entry.name for entry in entries}
+
+def slurp(path):
+    """Read a whole file with a single read() sized from fstat, without updating atime"""
+    try:
+        fd = os.open(path, os.O_RDONLY | getattr(os, 'O_NOATIME', 0))
+    except PermissionError:
+        # O_NOATIME is only allowed for the file's owner
+        fd = os.open(path, os.O_RDONLY)
+    try:
+        return os.read(fd, os.fstat(fd).st_size)
+    finally:
+        os.close(fd)
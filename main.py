@@ -1,18 +1,33 @@
 import os
+import sys
 import logging
 import asyncio
 import tempfile
 import shutil
 import time
-from urllib.parse import urlparse
+import atexit
+import queue
+import random
+import types
+import copy
+import functools
+import secrets
+import re
+from collections import namedtuple
 from pathlib import Path
+from typing import Literal, Optional
 
 import yt_dlp
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters, ContextTypes
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
+from telegram.ext import Application, ApplicationBuilder, CommandHandler, MessageHandler, CallbackQueryHandler, filters, ContextTypes
 from telegram.constants import ChatAction
+from telegram.error import BadRequest, NetworkError, TelegramError, TimedOut
+from telegram.request import HTTPXRequest
 from dotenv import load_dotenv
 
+# Plain text messages (candidate links), excluding commands
+_URL_FILTER = filters.TEXT & ~filters.COMMAND
+
 # Load environment variables
 load_dotenv()
 
@@ -26,13 +41,142 @@ logger = logging.getLogger(__name__)
 # Bot token from BotFather
 BOT_TOKEN = os.getenv('BOT_TOKEN')  # Get from environment variable
 
+# Matches supported links and captures the host (without www./m.)
+_HOST_RE = re.compile(r'^https?://(?:www\.|m\.)?(youtube\.com|youtu\.be|instagram\.com)(?:[/?#]|$)')
+_YOUTUBE_HOSTS = frozenset({'youtube.com', 'youtu.be'})
+
+# How long extracted video info is reused for repeated requests of the same link
+INFO_CACHE_TTL = 300  # 5 minutes
+
+# How long the quality buttons for a YouTube link stay usable
+PENDING_URL_TTL = 3600  # 1 hour
+
+# Maximum number of yt-dlp downloads running at the same time
+MAX_CONCURRENT_DOWNLOADS = 4
+
+# yt-dlp format strings for the quality buttons
+_QUALITY_MAP = types.MappingProxyType({
+    'best': '136+140/best[height<=720]/18',  # 720p+audio / best 720p / 360p fallback
+    '1080': '137+140/best[height<=1080]',  # 1080p+audio / best 1080p
+    '720': '136+140/best[height<=720]/134+140',  # 720p+audio / best 720p / 360p+audio
+    '480': '135+140/best[height<=480]/134+140',  # 480p+audio / best 480p / 360p+audio
+    'audio': 'bestaudio[ext=m4a]/bestaudio'
+})
+
+# Extensions a finished download can have
+_VIDEO_EXTS = ('.mp4', '.webm', '.mkv')
+_AUDIO_EXTS = _VIDEO_EXTS + ('.mp3',)
+
+# File size limits for Telegram uploads
+_MB = 1 << 20
+_TG_DOC_LIMIT = 50 * _MB  # larger files are sent as documents
+_TG_MAX = 2 * 1024 * _MB  # 2GB limit for regular users
+
+# Upload attempts for files sent as video/audio before giving up
+UPLOAD_ATTEMPTS = 3
+
+# Seconds between progress edits while a file uploads
+UPLOAD_PROGRESS_INTERVAL = 3
+
+# Prefix of the bot's working directory under the system temp dir
+TEMP_DIR_PREFIX = 'cloud_sage_'
+# File in each working dir holding the pid of the process that owns it
+OWNER_PID_FILE = 'owner.pid'
+# Partial downloads untouched for this long are leftovers from a crashed run
+STALE_PARTIAL_AGE = 3600  # 1 hour
+
+# Snapshot of a cookie file taken at startup so downloads don't re-stat it
+CookieState = namedtuple('CookieState', ['exists', 'path'])
+
+def count_lines(path) -> int:
+    """Count lines in a file using fixed-size binary reads"""
+    with open(path, 'rb') as f:
+        return sum(buf.count(b'\n') for buf in iter(lambda: f.read(1 << 16), b''))
+
+def pid_alive(pid: int) -> bool:
+    """Return whether a process with this pid is still running"""
+    if os.name == 'nt':
+        # os.kill() terminates the process on Windows, so assume it is alive
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists but belongs to another user
+        return True
+    return True
+
+class StatusUpdater:
+    """Edit a status message, skipping unchanged text and merging edits sent less than min_interval apart"""
+    
+    def __init__(self, query, min_interval: float = 1.0):
+        self.query = query
+        self.min_interval = min_interval
+        self.last_text = None
+        self.last_ts = 0.0
+        # Latest text held back by the rate limit, shown later by _flush_task
+        self.pending = None
+        self._flush_task = None
+        self._lock = asyncio.Lock()
+    
+    async def set(self, text: str, force: bool = False):
+        """Show text now, or hold it (replacing older held text) until min_interval has passed; force=True always shows it now"""
+        if force or time.monotonic() - self.last_ts >= self.min_interval:
+            self.pending = None
+            await self._show(text)
+            return
+        self.pending = text
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+    
+    async def _show(self, text: str):
+        """Edit the message unless it already shows text"""
+        async with self._lock:
+            if text == self.last_text:
+                return
+            self.last_ts = time.monotonic()
+            await self.query.edit_message_text(text)
+            self.last_text = text
+    
+    async def _flush_later(self):
+        """Show the held text once min_interval has passed since the last edit"""
+        try:
+            while self.pending is not None:
+                delay = self.last_ts + self.min_interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+                text, self.pending = self.pending, None
+                await self._show(text)
+        except TelegramError as e:
+            logger.warning(f"Status update failed: {e}")
+        finally:
+            self._flush_task = None
+
 class VideoDownloaderBot:
     def __init__(self):
-        self.temp_dir = tempfile.mkdtemp()
+        self.temp_dir = tempfile.mkdtemp(prefix=TEMP_DIR_PREFIX)
+        Path(self.temp_dir, OWNER_PID_FILE).write_text(str(os.getpid()))
+        self.sweep_stale_workdirs()
+        atexit.register(shutil.rmtree, self.temp_dir, ignore_errors=True)
         # Get the directory where the script is located for cookie files
         self.script_dir = Path(__file__).parent
         self.youtube_cookies = self.script_dir / "youtube.com_cookies.txt"
         self.instagram_cookies = self.script_dir / "instagram.com_cookies.txt"
+        # Resolve ffmpeg once instead of letting yt-dlp search PATH on every download
+        self._ffmpeg_path = shutil.which('ffmpeg')
+        if not self._ffmpeg_path:
+            logger.warning("⚠️ ffmpeg not found in PATH; merging formats and audio extraction will fail")
+        # (url, quality) -> (timestamp, info) for recently extracted videos
+        self._info_cache = {}
+        # yt-dlp runs in worker threads; cap how many run at once
+        self._dl_semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+        # Reusable per-download scratch directories inside temp_dir
+        self._slot_pool = queue.SimpleQueue()
+        self._slot_count = 0
+        for _ in range(MAX_CONCURRENT_DOWNLOADS):
+            self._slot_pool.put(self._new_slot())
         
         # Create cookie files from environment variables if they don't exist
         self.setup_cookies_from_env()
@@ -46,10 +190,11 @@ class VideoDownloaderBot:
         youtube_cookies_content = os.getenv('YOUTUBE_COOKIES')
         if youtube_cookies_content and not self.youtube_cookies.exists():
             try:
-                with open(self.youtube_cookies, 'w', encoding='utf-8') as f:
-                    # Replace \n with actual newlines if the env var uses escaped newlines
-                    content = youtube_cookies_content.replace('\\n', '\n')
-                    f.write(content)
+                content = youtube_cookies_content
+                # Replace \n with actual newlines if the env var uses escaped newlines
+                if '\\n' in content:
+                    content = content.replace('\\n', '\n')
+                self.youtube_cookies.write_text(content, encoding='utf-8')
                 logger.info("✅ YouTube cookies created from environment variable")
             except Exception as e:
                 logger.error(f"❌ Error creating YouTube cookies from env: {e}")
@@ -58,36 +203,41 @@ class VideoDownloaderBot:
         instagram_cookies_content = os.getenv('INSTAGRAM_COOKIES')
         if instagram_cookies_content and not self.instagram_cookies.exists():
             try:
-                with open(self.instagram_cookies, 'w', encoding='utf-8') as f:
-                    # Replace \n with actual newlines if the env var uses escaped newlines
-                    content = instagram_cookies_content.replace('\\n', '\n')
-                    f.write(content)
+                content = instagram_cookies_content
+                # Replace \n with actual newlines if the env var uses escaped newlines
+                if '\\n' in content:
+                    content = content.replace('\\n', '\n')
+                self.instagram_cookies.write_text(content, encoding='utf-8')
                 logger.info("✅ Instagram cookies created from environment variable")
             except Exception as e:
                 logger.error(f"❌ Error creating Instagram cookies from env: {e}")
     
+    def _stat_cookie_file(self, path):
+        """Return the current CookieState for a cookie file"""
+        return CookieState(path.exists(), str(path))
     
     def validate_cookie_files(self):
         """Validate that cookie files exist and are readable"""
-        if self.youtube_cookies.exists():
+        self._yt_cookie_state = self._stat_cookie_file(self.youtube_cookies)
+        self._ig_cookie_state = self._stat_cookie_file(self.instagram_cookies)
+        
+        if self._yt_cookie_state.exists:
             logger.info(f"✅ YouTube cookies file found: {self.youtube_cookies}")
-            try:
-                with open(self.youtube_cookies, 'r') as f:
-                    lines = f.readlines()
-                    logger.info(f"YouTube cookies file has {len(lines)} lines")
-            except Exception as e:
-                logger.error(f"❌ Error reading YouTube cookies: {e}")
+            if logger.isEnabledFor(logging.DEBUG):
+                try:
+                    logger.debug(f"YouTube cookies file has {count_lines(self.youtube_cookies)} lines")
+                except Exception as e:
+                    logger.error(f"❌ Error reading YouTube cookies: {e}")
         else:
             logger.warning(f"⚠️ YouTube cookies file not found at: {self.youtube_cookies}")
         
-        if self.instagram_cookies.exists():
+        if self._ig_cookie_state.exists:
             logger.info(f"✅ Instagram cookies file found: {self.instagram_cookies}")
-            try:
-                with open(self.instagram_cookies, 'r') as f:
-                    lines = f.readlines()
-                    logger.info(f"Instagram cookies file has {len(lines)} lines")
-            except Exception as e:
-                logger.error(f"❌ Error reading Instagram cookies: {e}")
+            if logger.isEnabledFor(logging.DEBUG):
+                try:
+                    logger.debug(f"Instagram cookies file has {count_lines(self.instagram_cookies)} lines")
+                except Exception as e:
+                    logger.error(f"❌ Error reading Instagram cookies: {e}")
         else:
             logger.warning(f"⚠️ Instagram cookies file not found at: {self.instagram_cookies}")
     
@@ -130,17 +280,162 @@ Just paste a link to get started! 🚀
         """
         await update.message.reply_text(help_text, parse_mode='Markdown')
     
-    def is_youtube_url(self, url: str) -> bool:
-        """Check if URL is from YouTube"""
-        parsed = urlparse(url)
-        return parsed.netloc in ['www.youtube.com', 'youtube.com', 'youtu.be', 'm.youtube.com']
+    @classmethod
+    def _classify(cls, url: str) -> Optional[Literal['yt', 'ig']]:
+        """Return 'yt' for YouTube URLs, 'ig' for Instagram URLs, None otherwise"""
+        match = _HOST_RE.match(url)
+        if match is None:
+            return None
+        return 'yt' if match.group(1) in _YOUTUBE_HOSTS else 'ig'
+    
+    def sweep_stale_workdirs(self):
+        """Delete working dirs (and any downloads in them) whose owning process is gone"""
+        with os.scandir(tempfile.gettempdir()) as entries:
+            for entry in entries:
+                if not entry.name.startswith(TEMP_DIR_PREFIX) or entry.path == self.temp_dir:
+                    continue
+                try:
+                    if not entry.is_dir(follow_symlinks=False):
+                        continue
+                    try:
+                        owner = int(Path(entry.path, OWNER_PID_FILE).read_text())
+                    except (FileNotFoundError, ValueError):
+                        # Owner unknown (older version, or pid not written yet); only stale partials are safe to remove
+                        self._sweep_stale_partials(entry.path)
+                        continue
+                    # Our own pid here means a previous run in this container that reused it
+                    if owner != os.getpid() and pid_alive(owner):
+                        continue
+                    shutil.rmtree(entry.path)
+                    logger.info(f"Removed stale working directory: {entry.path}")
+                except OSError as e:
+                    logger.warning(f"Could not remove stale working directory {entry.path}: {e}")
+    
+    def _sweep_stale_partials(self, workdir):
+        """Delete partial yt-dlp files in workdir that haven't been written to recently"""
+        cutoff = time.time() - STALE_PARTIAL_AGE
+        for leftover in Path(workdir).glob("**/*"):
+            if leftover.name.endswith(('.part', '.ytdl')):
+                try:
+                    if leftover.stat().st_mtime < cutoff:
+                        leftover.unlink()
+                        logger.info(f"Removed stale partial download: {leftover}")
+                except OSError as e:
+                    logger.warning(f"Could not remove stale partial download {leftover}: {e}")
+    
+    def _new_slot(self):
+        """Create a new scratch directory for a download"""
+        slot = os.path.join(self.temp_dir, f"slot_{self._slot_count}")
+        self._slot_count += 1
+        os.makedirs(slot, exist_ok=True)
+        return slot
+    
+    def _acquire_slot(self):
+        """Take a scratch directory from the pool, growing it if all are in use"""
+        try:
+            return self._slot_pool.get_nowait()
+        except queue.Empty:
+            return self._new_slot()
+    
+    def _release_slot(self, slot):
+        """Empty a scratch directory and return it to the pool"""
+        try:
+            with os.scandir(slot) as entries:
+                for entry in entries:
+                    os.remove(entry.path)
+        except OSError as e:
+            logger.warning(f"Error cleaning download slot {slot}: {e}")
+        self._slot_pool.put(slot)
+    
+    def _get_cached_info(self, key):
+        """Return cached video info for key if it hasn't expired"""
+        entry = self._info_cache.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > INFO_CACHE_TTL:
+            self._info_cache.pop(key, None)
+            return None
+        return entry[1]
+    
+    def _cache_info(self, key, info):
+        """Store video info and drop expired entries"""
+        now = time.monotonic()
+        for k in [k for k, (ts, _) in list(self._info_cache.items()) if now - ts > INFO_CACHE_TTL]:
+            self._info_cache.pop(k, None)
+        self._info_cache[key] = (now, info)
+    
+    def _locate_download(self, ydl, info, extensions, slot):
+        """Return the path of a finished download without scanning the slot"""
+        # Final paths reported by yt-dlp (after merging/post-processing), then the template path
+        candidates = [d.get('filepath') for d in info.get('requested_downloads') or []]
+        candidates.append(ydl.prepare_filename(info))
+        for path in candidates:
+            if path and os.path.dirname(path) == slot and path.endswith(extensions) and os.path.exists(path):
+                return path
+        return None
     
-    def is_instagram_url(self, url: str) -> bool:
-        """Check if URL is from Instagram"""
-        parsed = urlparse(url)
-        return parsed.netloc in ['www.instagram.com', 'instagram.com']
+    def _cleanup_download(self, result):
+        """Remove a sent download and recycle its slot"""
+        self._release_slot(result['slot'])
+    
+    async def _with_retry(self, coro_factory, attempts: int = 3, base: float = 1.0, on_retry=None):
+        """Await coro_factory(), retrying Telegram network errors with exponential backoff"""
+        for attempt in range(1, attempts + 1):
+            try:
+                return await coro_factory()
+            except BadRequest:
+                raise  # Subclass of NetworkError, but retrying won't help
+            except NetworkError as e:
+                logger.error(f"Upload attempt {attempt} failed: {e} ({type(e).__name__})")
+                if attempt == attempts:
+                    raise
+                if on_retry is not None:
+                    try:
+                        await on_retry(attempt)
+                    except TelegramError as notify_error:
+                        logger.warning(f"Retry notification failed: {notify_error}")
+                await asyncio.sleep(base * 2 ** (attempt - 1) + random.random() * 0.25)
+    
+    async def _read_upload(self, file_path, filename=None):
+        """Read a file for upload in a worker thread; PTB would otherwise read it on the event loop"""
+        data = await asyncio.to_thread(Path(file_path).read_bytes)
+        return InputFile(data, filename=filename or os.path.basename(file_path))
+    
+    def _download_done(self, job, fut):
+        """Release the download permit, and the slot unless its file is about to be uploaded"""
+        self._dl_semaphore.release()
+        failed = fut.cancelled() or fut.exception() is not None or 'error' in fut.result()
+        if failed or job['abandoned']:
+            job['slot_released'] = True
+            self._release_slot(job['slot'])
+    
+    async def _run_download(self, func, *args):
+        """Run a blocking download function in a worker thread inside its own slot"""
+        await self._dl_semaphore.acquire()
+        slot = self._acquire_slot()
+        job = {'slot': slot, 'abandoned': False, 'slot_released': False}
+        fut = asyncio.ensure_future(asyncio.to_thread(func, *args, slot))
+        # wait_for() timeouts don't stop the thread, so keep the permit and slot until it actually finishes
+        fut.add_done_callback(functools.partial(self._download_done, job))
+        try:
+            result = await asyncio.shield(fut)
+        except asyncio.CancelledError:
+            job['abandoned'] = True
+            if fut.done() and not job['slot_released']:
+                # Finished just as we were cancelled, so nobody will upload it
+                job['slot_released'] = True
+                self._release_slot(slot)
+            raise
+        
+        if not job['slot_released']:
+            result['slot'] = slot
+        return result
     
     async def download_youtube_video(self, url: str, quality: str = 'best') -> dict:
+        """Download YouTube video without blocking the event loop"""
+        return await self._run_download(self._download_youtube_video_sync, url, quality)
+    
+    def _download_youtube_video_sync(self, url: str, quality: str, slot: str) -> dict:
         """Download YouTube video using yt-dlp"""
         try:
             # Clean filename template with quality info to avoid conflicts
@@ -153,7 +448,7 @@ Just paste a link to get started! 🚀
             # Configure yt-dlp options
             ydl_opts = {
                 'format': quality,
-                'outtmpl': os.path.join(self.temp_dir, filename_template),
+                'outtmpl': os.path.join(slot, filename_template),
                 'noplaylist': True,
                 'writeinfojson': False,
                 'writesubtitles': False,
@@ -163,10 +458,12 @@ Just paste a link to get started! 🚀
                 'prefer_ffmpeg': True,
                 'merge_output_format': 'mp4',
             }
+            if self._ffmpeg_path:
+                ydl_opts['ffmpeg_location'] = self._ffmpeg_path
             
             # Add YouTube cookies if the file exists
-            if self.youtube_cookies.exists():
-                ydl_opts['cookiefile'] = str(self.youtube_cookies)
+            if self._yt_cookie_state.exists:
+                ydl_opts['cookiefile'] = self._yt_cookie_state.path
                 logger.info(f"Using YouTube cookies from: {self.youtube_cookies}")
             else:
                 logger.warning("YouTube cookies file not found, proceeding without authentication")
@@ -183,73 +480,74 @@ Just paste a link to get started! 🚀
                 })
             
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Extract info first
-                info = ydl.extract_info(url, download=False)
+                # Extract info first (reuse a recent extraction of the same link)
+                cache_key = (url, quality)
+                info = self._get_cached_info(cache_key)
+                if info is None:
+                    info = ydl.extract_info(url, download=False)
+                    self._cache_info(cache_key, info)
+                else:
+                    logger.info(f"Using cached info for {url}")
                 title = info.get('title', 'Unknown')
                 video_id = info.get('id', 'unknown')
                 duration = info.get('duration', 0)
                 
-                # Log available formats for debugging
-                formats = info.get('formats', [])
-                logger.info(f"Available formats for {video_id}: {len(formats)} formats")
-                
-                # Log some high quality formats available
-                high_quality_formats = [f for f in formats if (f.get('height') or 0) >= 720]
-                logger.info(f"High quality formats (720p+): {len(high_quality_formats)}")
-                for fmt in high_quality_formats[:3]:  # Log first 3
-                    height = fmt.get('height') or 0
-                    logger.info(f"Format {fmt.get('format_id')}: {height}p, {fmt.get('ext')}")
-                
                 # Check file size (estimate)
                 if duration and duration > 600:  # 10 minutes
                     return {'error': 'Video is too long (max 10 minutes allowed)'}
                 
                 logger.info(f"Using format string: {quality}")
                 
-                # Try to get selected format info for debugging
-                try:
-                    selected_formats = ydl._format_selection(info['formats'], quality)
-                    if selected_formats:
-                        for fmt in selected_formats[:2]:  # Log first 2 selected formats
-                            logger.info(f"Selected format: {fmt.get('format_id')} - {fmt.get('height', 'unknown')}p")
-                except:
-                    pass  # Ignore format selection debug errors
+                if logger.isEnabledFor(logging.DEBUG):
+                    # Log available formats for debugging
+                    formats = info.get('formats') or []
+                    logger.debug(f"Available formats for {video_id}: {len(formats)} formats")
+                    
+                    # Log some high quality formats available
+                    high_quality_formats = [f for f in formats if (f.get('height') or 0) >= 720]
+                    logger.debug(f"High quality formats (720p+): {len(high_quality_formats)}")
+                    for fmt in high_quality_formats[:3]:  # Log first 3
+                        height = fmt.get('height') or 0
+                        logger.debug(f"Format {fmt.get('format_id')}: {height}p, {fmt.get('ext')}")
+                    
+                    # Log the formats yt-dlp selected during extraction
+                    for fmt in (info.get('requested_formats') or [info])[:2]:  # Log first 2 selected formats
+                        logger.debug(f"Selected format: {fmt.get('format_id')} - {fmt.get('height', 'unknown')}p")
                 
-                # Download the video
-                ydl.download([url])
+                # Download the video, reusing the extracted info instead of resolving the URL again
+                downloaded = ydl.process_ie_result(copy.deepcopy(info), download=True)
                 
                 # Find the downloaded file using video ID and quality suffix
-                try:
-                    quality_suffix = quality.split('+')[0].replace('/', '_')[:10]
-                except (AttributeError, IndexError):
-                    quality_suffix = 'video'
+                expected_extensions = _AUDIO_EXTS if 'bestaudio' in quality else _VIDEO_EXTS
+                download_key = f"{video_id}_{quality_suffix}"
                 
-                expected_extensions = ['.mp4', '.webm', '.mkv', '.mp3'] if 'bestaudio' in quality else ['.mp4', '.webm', '.mkv']
+                file_path = self._locate_download(ydl, downloaded, expected_extensions, slot)
+                if file_path is None:
+                    for ext in expected_extensions:
+                        candidate = os.path.join(slot, f"{download_key}{ext}")
+                        if os.path.exists(candidate):
+                            file_path = candidate
+                            break
                 
-                for ext in expected_extensions:
-                    file_path = os.path.join(self.temp_dir, f"{video_id}_{quality_suffix}{ext}")
-                    if os.path.exists(file_path):
-                        logger.info(f"Found downloaded file: {file_path} ({os.path.getsize(file_path)} bytes)")
-                        return {
-                            'success': True,
-                            'file_path': file_path,
-                            'title': title,
-                            'type': 'audio' if quality == 'bestaudio' else 'video'
-                        }
+                if file_path is None:
+                    # Fallback: search for any file containing the video ID
+                    with os.scandir(slot) as entries:
+                        for entry in entries:
+                            if video_id in entry.name and entry.name.endswith(expected_extensions):
+                                file_path = entry.path
+                                logger.info(f"Found downloaded file using fallback search: {file_path}")
+                                break
                 
-                # Fallback: search for any file containing the video ID
-                for file in os.listdir(self.temp_dir):
-                    if video_id in file and any(file.endswith(ext) for ext in expected_extensions):
-                        file_path = os.path.join(self.temp_dir, file)
-                        logger.info(f"Found downloaded file (fallback): {file_path} ({os.path.getsize(file_path)} bytes)")
-                        return {
-                            'success': True,
-                            'file_path': file_path,
-                            'title': title,
-                            'type': 'audio' if quality == 'bestaudio' else 'video'
-                        }
+                if file_path is None:
+                    return {'error': 'Download completed but file not found'}
                 
-                return {'error': 'Download completed but file not found'}
+                logger.info(f"Found downloaded file: {file_path} ({os.path.getsize(file_path)} bytes)")
+                return {
+                    'success': True,
+                    'file_path': file_path,
+                    'title': title,
+                    'type': 'audio' if quality == 'bestaudio' else 'video'
+                }
                 
         except Exception as e:
             logger.error(f"YouTube download error: {str(e)}")
@@ -257,7 +555,7 @@ Just paste a link to get started! 🚀
             
             # Check for common authentication errors
             if any(keyword in error_msg for keyword in ['login', 'sign in', 'private', 'unavailable', 'members only', 'age-restricted']):
-                if self.youtube_cookies.exists():
+                if self._yt_cookie_state.exists:
                     return {'error': 'Video requires authentication. Please update your YouTube cookies file.'}
                 else:
                     return {'error': 'Video requires authentication. Please add your YouTube cookies file.'}
@@ -267,61 +565,67 @@ Just paste a link to get started! 🚀
                 return {'error': f'Download failed: {str(e)}'}
     
     async def download_instagram_content(self, url: str) -> dict:
+        """Download Instagram content without blocking the event loop"""
+        return await self._run_download(self._download_instagram_content_sync, url)
+    
+    def _download_instagram_content_sync(self, url: str, slot: str) -> dict:
         """Download Instagram content using yt-dlp"""
         try:
             # Configure yt-dlp options for Instagram
             ydl_opts = {
                 'format': 'best[ext=mp4]/best',
-                'outtmpl': os.path.join(self.temp_dir, '%(id)s.%(ext)s'),
+                'outtmpl': os.path.join(slot, '%(id)s.%(ext)s'),
                 'merge_output_format': 'mp4',
                 'writeinfojson': False,
                 'writesubtitles': False,
                 'writeautomaticsub': False,
             }
+            if self._ffmpeg_path:
+                ydl_opts['ffmpeg_location'] = self._ffmpeg_path
             
             # Add Instagram cookies if the file exists
-            if self.instagram_cookies.exists():
-                ydl_opts['cookiefile'] = str(self.instagram_cookies)
+            if self._ig_cookie_state.exists:
+                ydl_opts['cookiefile'] = self._ig_cookie_state.path
                 logger.info(f"Using Instagram cookies from: {self.instagram_cookies}")
             else:
                 logger.warning("Instagram cookies file not found, proceeding without authentication")
             
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Extract info first
-                info = ydl.extract_info(url, download=False)
+                # Extract info and download the content in a single pass
+                info = ydl.extract_info(url, download=True)
                 title = info.get('title', 'Instagram_Video')
                 video_id = info.get('id', 'instagram_video')
                 
-                # Download the content
-                ydl.download([url])
-                
                 # Find the downloaded file using video ID
-                expected_extensions = ['.mp4', '.webm', '.mkv']
+                expected_extensions = _VIDEO_EXTS
                 
-                for ext in expected_extensions:
-                    file_path = os.path.join(self.temp_dir, f"{video_id}{ext}")
-                    if os.path.exists(file_path):
-                        return {
-                            'success': True,
-                            'file_path': file_path,
-                            'title': title,
-                            'type': 'video'
-                        }
+                file_path = self._locate_download(ydl, info, expected_extensions, slot)
+                if file_path is None:
+                    for ext in expected_extensions:
+                        candidate = os.path.join(slot, f"{video_id}{ext}")
+                        if os.path.exists(candidate):
+                            file_path = candidate
+                            break
                 
-                # Fallback: search for any recent video file
-                for file in os.listdir(self.temp_dir):
-                    if any(file.endswith(ext) for ext in expected_extensions):
-                        file_path = os.path.join(self.temp_dir, file)
-                        # Check if file was created recently (within last 30 seconds)
-                        if os.path.getctime(file_path) > (time.time() - 30):
-                            return {
-                                'success': True,
-                                'file_path': file_path,
-                                'title': title,
-                                'type': 'video'
-                            }
+                if file_path is None:
+                    # Fallback: search for any recent video file
+                    cutoff = time.time() - 30
+                    with os.scandir(slot) as entries:
+                        for entry in entries:
+                            # Check if file was created recently (within last 30 seconds)
+                            if entry.name.endswith(expected_extensions) and entry.stat().st_ctime > cutoff:
+                                file_path = entry.path
+                                break
                 
-                return {'error': 'Download completed but video file not found'}
+                if file_path is None:
+                    return {'error': 'Download completed but video file not found'}
+                
+                return {
+                    'success': True,
+                    'file_path': file_path,
+                    'title': title,
+                    'type': 'video'
+                }
             
         except Exception as e:
             logger.error(f"Instagram download error: {str(e)}")
@@ -329,7 +633,7 @@ Just paste a link to get started! 🚀
             
             # Check for common authentication errors
             if any(keyword in error_msg for keyword in ['login', 'sign in', 'private', 'unavailable']):
-                if self.instagram_cookies.exists():
+                if self._ig_cookie_state.exists:
                     return {'error': 'Content requires authentication. Please update your Instagram cookies file.'}
                 else:
                     return {'error': 'Content requires authentication. Please add your Instagram cookies file.'}
@@ -340,27 +644,34 @@ Just paste a link to get started! 🚀
         """Handle incoming URLs"""
         url = update.message.text.strip()
         
-        # Check if it's a valid URL
-        if not url.startswith(('http://', 'https://')):
-            await update.message.reply_text("Please send a valid URL starting with http:// or https://")
-            return
-        
         # Determine platform and show options
-        if self.is_youtube_url(url):
+        platform = self._classify(url)
+        if platform == 'yt':
+            # Telegram limits callback data to 64 bytes, so keep the URL server-side behind a short token
+            pending = context.bot_data.setdefault('pending', {})
+            now = time.monotonic()
+            for token in [t for t, (ts, _) in pending.items() if now - ts > PENDING_URL_TTL]:
+                del pending[token]
+            token = secrets.token_urlsafe(6)
+            pending[token] = (now, url)
+            
             keyboard = [
-                [InlineKeyboardButton("🎥 Best Quality (720p)", callback_data=f"yt_best_{url}")],
-                [InlineKeyboardButton("🔥 1080p (Large File)", callback_data=f"yt_1080_{url}")],
-                [InlineKeyboardButton("📱 720p", callback_data=f"yt_720_{url}")],
-                [InlineKeyboardButton("📱 480p", callback_data=f"yt_480_{url}")],
-                [InlineKeyboardButton("🎵 Audio Only (MP3)", callback_data=f"yt_audio_{url}")]
+                [InlineKeyboardButton("🎥 Best Quality (720p)", callback_data=f"yt|best|{token}")],
+                [InlineKeyboardButton("🔥 1080p (Large File)", callback_data=f"yt|1080|{token}")],
+                [InlineKeyboardButton("📱 720p", callback_data=f"yt|720|{token}")],
+                [InlineKeyboardButton("📱 480p", callback_data=f"yt|480|{token}")],
+                [InlineKeyboardButton("🎵 Audio Only (MP3)", callback_data=f"yt|audio|{token}")]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             await update.message.reply_text("Choose download quality:", reply_markup=reply_markup)
             
-        elif self.is_instagram_url(url):
+        elif platform == 'ig':
             await update.message.reply_text("📥 Starting Instagram download...")
             await self.process_instagram_download(update, url)
             
+        elif not url.startswith(('http://', 'https://')):
+            await update.message.reply_text("Please send a valid URL starting with http:// or https://")
+            
         else:
             await update.message.reply_text("❌ Unsupported URL. Please send a YouTube or Instagram link.")
     
@@ -372,36 +683,44 @@ Just paste a link to get started! 🚀
         data = query.data
         logger.info(f"Button callback data: {data}")
         
-        if data.startswith('yt_'):
+        if data.startswith('yt|'):
             try:
-                parts = data.split('_', 2)
-                quality = parts[1]
-                url = parts[2]
-                logger.info(f"Parsed - Quality: {quality}, URL: {url[:50]}...")
-            except IndexError as e:
+                _, quality, token = data.split('|', 2)
+            except ValueError as e:
                 logger.error(f"Error parsing callback data: {e}")
                 await query.edit_message_text("❌ Error: Invalid button data")
                 return
             
-            quality_map = {
-                'best': '136+140/best[height<=720]/18',  # 720p+audio / best 720p / 360p fallback
-                '1080': '137+140/best[height<=1080]',  # 1080p+audio / best 1080p
-                '720': '136+140/best[height<=720]/134+140',  # 720p+audio / best 720p / 360p+audio
-                '480': '135+140/best[height<=480]/134+140',  # 480p+audio / best 480p / 360p+audio
-                'audio': 'bestaudio[ext=m4a]/bestaudio'
-            }
+            entry = context.bot_data.get('pending', {}).pop(token, None)
+            if entry is None:
+                await query.edit_message_text("❌ This link has expired. Please send it again.")
+                return
+            url = entry[1]
+            logger.info(f"Parsed - Quality: {quality}, URL: {url[:50]}...")
+            
+            format_str = _QUALITY_MAP.get(quality)
+            if format_str is None:
+                # Quality key no longer offered (legacy 'yt_' buttons are handled below)
+                await query.edit_message_text("❌ This option is no longer available. Please send the link again.")
+                return
             
             await query.edit_message_text("📥 Starting YouTube download...")
-            await self.process_youtube_download(query, url, quality_map[quality])
+            await self.process_youtube_download(query, url, format_str, quality)
+        
+        elif data.startswith('yt_'):
+            # Old 'yt_<quality>_<url>' buttons sent before URLs were kept server-side
+            await query.edit_message_text("❌ This option is no longer available. Please send the link again.")
     
-    async def process_youtube_download(self, query, url: str, quality: str):
+    async def process_youtube_download(self, query, url: str, quality: str, quality_key: str = 'best'):
         """Process YouTube download"""
+        status = StatusUpdater(query)
+        result = None
         try:
             # Send typing action
             await query.message.chat.send_action(ChatAction.UPLOAD_VIDEO)
             
             # Update message to show download progress
-            await query.edit_message_text("📥 Downloading video... This may take a few minutes for large files.")
+            await status.set("📥 Downloading video... This may take a few minutes for large files.")
             
             # Download video with timeout (longer for large files)
             result = await asyncio.wait_for(
@@ -410,14 +729,16 @@ Just paste a link to get started! 🚀
             )
             
             if 'error' in result:
-                await query.edit_message_text(f"❌ Error: {result['error']}")
+                await status.set(f"❌ Error: {result['error']}", force=True)
                 return
             
             # Send file
             file_path = result['file_path']
             file_size = os.path.getsize(file_path)
+            size_mb = file_size / _MB
+            size_str = f"{size_mb:.1f} MB"
             
-            await query.edit_message_text(f"✅ Downloaded! File size: {file_size / (1024*1024):.1f} MB. Format used: {quality}. Preparing upload...")
+            await status.set(f"✅ Downloaded! File size: {size_str}. Format used: {quality}. Preparing upload...")
             
             # Check file size and warn if unexpected
             expected_sizes = {
@@ -427,43 +748,34 @@ Just paste a link to get started! 🚀
                 '1080': 150  # ~150MB for 1080p
             }
             
-            # Extract quality from callback data safely
-            try:
-                quality_key = query.data.split('_')[1] if '_' in query.data else 'best'
-            except (IndexError, AttributeError):
-                quality_key = 'best'
-            
             expected_mb = expected_sizes.get(quality_key, 50)
-            if file_size > expected_mb * 1024 * 1024 * 1.5:  # 50% tolerance
-                await query.edit_message_text(f"⚠️ Warning: File is larger than expected ({file_size / (1024*1024):.1f} MB vs ~{expected_mb} MB). Quality selection might have failed. Proceeding with upload...")
+            if size_mb > expected_mb * 1.5:  # 50% tolerance
+                await status.set(f"⚠️ Warning: File is larger than expected ({size_str} vs ~{expected_mb} MB). Quality selection might have failed. Proceeding with upload...", force=True)
             
             # Check file size (Telegram limit is 50MB for bots, but we can try up to 2GB for users)
-            max_size = 2 * 1024 * 1024 * 1024  # 2GB limit for regular users
-            if file_size > max_size:
-                await query.edit_message_text("❌ File is too large (>2GB). This video cannot be sent via Telegram.")
+            if file_size > _TG_MAX:
+                await status.set("❌ File is too large (>2GB). This video cannot be sent via Telegram.", force=True)
                 return
-            elif file_size > 50 * 1024 * 1024:
+            elif file_size > _TG_DOC_LIMIT:
                 # For files over 50MB, we need to send as document instead of video
-                await query.edit_message_text(f"📤 File is large ({file_size / (1024*1024):.1f} MB). Uploading as document... Please wait, this may take several minutes.")
+                await status.set(f"📤 File is large ({size_str}). Uploading as document... Please wait, this may take several minutes.")
                 
                 try:
-                    with open(file_path, 'rb') as file:
-                        if result['type'] == 'audio':
-                            # Remove timeout for uploads - let Telegram handle it
-                            await query.message.reply_audio(
-                                audio=file,
-                                title=result['title'],
-                                caption=f"🎵 {result['title']} ({file_size / (1024*1024):.1f} MB)"
-                            )
-                        else:
-                            # Send as document for large videos - no timeout
-                            await query.message.reply_document(
-                                document=file,
-                                caption=f"🎥 {result['title']} ({file_size / (1024*1024):.1f} MB)",
-                                filename=f"{result['title'][:50]}.mp4"
-                            )
+                    if result['type'] == 'audio':
+                        # Remove timeout for uploads - let Telegram handle it
+                        await query.message.reply_audio(
+                            audio=await self._read_upload(file_path, f"{result['title'][:50]}{os.path.splitext(file_path)[1]}"),
+                            title=result['title'],
+                            caption=f"🎵 {result['title']} ({size_str})"
+                        )
+                    else:
+                        # Send as document for large videos - no timeout
+                        await query.message.reply_document(
+                            document=await self._read_upload(file_path, f"{result['title'][:50]}.mp4"),
+                            caption=f"🎥 {result['title']} ({size_str})"
+                        )
                     
-                    await query.edit_message_text("✅ Upload completed! Large file sent as document.")
+                    await status.set("✅ Upload completed! Large file sent as document.", force=True)
                     
                 except Exception as upload_error:
                     error_msg = str(upload_error)
@@ -472,79 +784,73 @@ Just paste a link to get started! 🚀
                     
                     # Check if it's actually a timeout or another error
                     if "timeout" in error_msg.lower() or "timed out" in error_msg.lower():
-                        await query.edit_message_text(f"📤 Large file upload is taking longer than expected ({file_size / (1024*1024):.1f} MB). The file may still be uploading in the background. Please wait...")
+                        await status.set(f"📤 Large file upload is taking longer than expected ({size_str}). The file may still be uploading in the background. Please wait...", force=True)
                         # Don't return here - the upload might still succeed
                     else:
-                        await query.edit_message_text(f"❌ Upload failed: {error_msg}. File: {file_size / (1024*1024):.1f} MB. Please try a lower quality.")
+                        await status.set(f"❌ Upload failed: {error_msg}. File: {size_str}. Please try a lower quality.", force=True)
                         return
             else:
                 # Normal upload for files under 50MB
-                await query.edit_message_text(f"📤 Uploading to Telegram... ({file_size / (1024*1024):.1f} MB)")
-                
-                upload_success = False
-                max_retries = 3
-                
-                for attempt in range(max_retries):
-                    try:
-                        with open(file_path, 'rb') as file:
-                            if result['type'] == 'audio':
-                                await query.message.reply_audio(
-                                    audio=file,
-                                    title=result['title'],
-                                    caption=f"🎵 {result['title']}"
-                                )
-                            else:
-                                await query.message.reply_video(
-                                    video=file,
-                                    caption=f"🎥 {result['title']}"
-                                )
-                        
-                        upload_success = True
-                        break  # Upload successful, exit retry loop
-                        
-                    except Exception as upload_error:
-                        error_msg = str(upload_error)
-                        logger.error(f"Upload attempt {attempt + 1} failed: {error_msg}")
-                        logger.error(f"Error type: {type(upload_error).__name__}")
-                        
-                        # Check if it's a timeout and we should retry
-                        if ("timeout" in error_msg.lower() or "timed out" in error_msg.lower()) and attempt < max_retries - 1:
-                            await query.edit_message_text(f"📤 Upload attempt {attempt + 1} timed out. Retrying... ({file_size / (1024*1024):.1f} MB)")
-                            await asyncio.sleep(2)  # Wait 2 seconds before retry
-                            continue
-                        else:
-                            # Either not a timeout error or final attempt failed
-                            if "timeout" in error_msg.lower() or "timed out" in error_msg.lower():
-                                await query.edit_message_text(f"📤 Upload is taking longer than expected ({file_size / (1024*1024):.1f} MB). The file may still be uploading in the background. Please wait a moment...")
-                                # Don't return here - give it some more time
-                                await asyncio.sleep(10)  # Wait 10 seconds
-                                # Check if file was actually uploaded by trying one more time
-                                return
-                            else:
-                                await query.edit_message_text(f"❌ Upload failed: {error_msg}. File: {file_size / (1024*1024):.1f} MB.")
-                                return
+                await status.set(f"📤 Uploading to Telegram... ({size_str})")
                 
-                if upload_success:
-                    await query.edit_message_text("✅ Download completed!")
+                # Read once so retries reuse the same contents
+                upload_file = await self._read_upload(file_path)
+                if result['type'] == 'audio':
+                    send = lambda: query.message.reply_audio(
+                        audio=upload_file,
+                        title=result['title'],
+                        caption=f"🎵 {result['title']}"
+                    )
                 else:
-                    await query.edit_message_text(f"❌ Upload failed after {max_retries} attempts. File: {file_size / (1024*1024):.1f} MB. Please try again or use a lower quality.")
-            
-            # Clean up
-            try:
-                os.remove(file_path)
-            except:
-                pass  # Ignore cleanup errors
+                    send = lambda: query.message.reply_video(
+                        video=upload_file,
+                        caption=f"🎥 {result['title']}"
+                    )
+                
+                # Upload in the background and report progress while it runs
+                upload_task = asyncio.create_task(self._with_retry(
+                    send,
+                    attempts=UPLOAD_ATTEMPTS,
+                    on_retry=lambda attempt: status.set(f"📤 Upload attempt {attempt} failed. Retrying... ({size_str})", force=True)
+                ))
+                started = time.monotonic()
+                try:
+                    while not (await asyncio.wait({upload_task}, timeout=UPLOAD_PROGRESS_INTERVAL))[0]:
+                        try:
+                            await status.set(f"📤 Uploading to Telegram... ({size_str}, {int(time.monotonic() - started)}s)")
+                        except TelegramError as e:
+                            # A failed progress edit must not affect the upload itself
+                            logger.warning(f"Progress update failed: {e}")
+                    await upload_task
+                    await status.set("✅ Download completed!", force=True)
+                except TimedOut:
+                    await status.set(f"📤 Upload is taking longer than expected ({size_str}). The file may still be uploading in the background. Please wait a moment...", force=True)
+                except BadRequest as upload_error:
+                    await status.set(f"❌ Upload failed: {upload_error}. File: {size_str}.", force=True)
+                except NetworkError as upload_error:
+                    await status.set(f"❌ Upload failed after {UPLOAD_ATTEMPTS} attempts: {upload_error}. File: {size_str}. Please try again or use a lower quality.", force=True)
+                except Exception as upload_error:
+                    logger.error(f"Upload failed: {upload_error}")
+                    logger.error(f"Error type: {type(upload_error).__name__}")
+                    await status.set(f"❌ Upload failed: {upload_error}. File: {size_str}.", force=True)
+                finally:
+                    upload_task.cancel()  # No-op once the upload has finished
             
         except asyncio.TimeoutError:
-            await query.edit_message_text("❌ Download timed out after 5 minutes. The video is likely too large or connection is slow. Please try a lower quality (720p or 480p).")
+            await status.set("❌ Download timed out after 5 minutes. The video is likely too large or connection is slow. Please try a lower quality (720p or 480p).", force=True)
         except Exception as e:
             logger.error(f"YouTube processing error: {str(e)}")
             logger.error(f"Query data: {query.data}")
             logger.error(f"Quality string: {quality}")
-            await query.edit_message_text(f"❌ Error processing download: {str(e)}")
+            await status.set(f"❌ Error processing download: {str(e)}", force=True)
+        finally:
+            # Clean up
+            if result and 'slot' in result:
+                self._cleanup_download(result)
     
     async def process_instagram_download(self, update: Update, url: str):
         """Process Instagram download"""
+        result = None
         try:
             # Send typing action
             await update.message.chat.send_action(ChatAction.UPLOAD_VIDEO)
@@ -564,35 +870,32 @@ Just paste a link to get started! 🚀
             file_size = os.path.getsize(file_path)
             
             # Check file size
-            if file_size > 50 * 1024 * 1024:
+            if file_size > _TG_DOC_LIMIT:
                 await update.message.reply_text("❌ File is too large (>50MB).")
                 return
             
             try:
-                with open(file_path, 'rb') as file:
-                    await update.message.reply_video(
-                        video=file,
-                        caption=f"📱 {result['title']}"
-                    )
+                await update.message.reply_video(
+                    video=await self._read_upload(file_path),
+                    caption=f"📱 {result['title']}"
+                )
                 
                 await update.message.reply_text("✅ Download completed!")
                 
             except Exception as upload_error:
                 logger.error(f"Instagram upload error: {str(upload_error)}")
-                await update.message.reply_text(f"❌ Upload failed: {str(upload_error)}. File: {file_size / (1024*1024):.1f} MB.")
+                await update.message.reply_text(f"❌ Upload failed: {str(upload_error)}. File: {file_size / _MB:.1f} MB.")
                 return
             
-            # Clean up
-            try:
-                os.remove(file_path)
-            except:
-                pass  # Ignore cleanup errors
-            
         except asyncio.TimeoutError:
             await update.message.reply_text("❌ Download timed out. Please try again.")
         except Exception as e:
             logger.error(f"Instagram processing error: {str(e)}")
             await update.message.reply_text(f"❌ Error processing download: {str(e)}")
+        finally:
+            # Clean up
+            if result and 'slot' in result:
+                self._cleanup_download(result)
 
 def main():
     """Start the bot"""
@@ -607,33 +910,43 @@ def main():
     bot = VideoDownloaderBot()
     
     # Log cookie status
-    youtube_status = "✅ Available" if bot.youtube_cookies.exists() else "❌ Missing"
-    instagram_status = "✅ Available" if bot.instagram_cookies.exists() else "❌ Missing"
+    yt_present = bot._yt_cookie_state.exists
+    ig_present = bot._ig_cookie_state.exists
+    youtube_status = "✅ Available" if yt_present else "❌ Missing"
+    instagram_status = "✅ Available" if ig_present else "❌ Missing"
     
-    print(f"📺 YouTube cookies: {youtube_status}")
-    print(f"📱 Instagram cookies: {instagram_status}")
-    
-    if not bot.youtube_cookies.exists() and not bot.instagram_cookies.exists():
-        print("⚠️  No cookies found! Some videos may require authentication.")
-        print("💡 Add YOUTUBE_COOKIES and INSTAGRAM_COOKIES environment variables for full functionality.")
+    banner = [
+        f"📺 YouTube cookies: {youtube_status}",
+        f"📱 Instagram cookies: {instagram_status}",
+    ]
+    if not yt_present and not ig_present:
+        banner.append("⚠️  No cookies found! Some videos may require authentication.")
+        banner.append("💡 Add YOUTUBE_COOKIES and INSTAGRAM_COOKIES environment variables for full functionality.")
+    sys.stdout.write("\n".join(banner) + "\n")
     
     # Create application with custom timeouts
-    from telegram.ext import ApplicationBuilder
+    request = HTTPXRequest(
+        connection_pool_size=8,  # allow several uploads and status edits in parallel
+        read_timeout=600,  # 10 minutes read timeout so large uploads can finish
+        write_timeout=300,  # 5 minutes write timeout for uploads
+        connect_timeout=30,  # 30 seconds connect timeout
+        pool_timeout=30,  # 30 seconds pool timeout
+        http_version='2'  # multiplex Bot API calls over one connection
+    )
     application = (
         ApplicationBuilder()
         .token(BOT_TOKEN)
-        .read_timeout(60)  # 60 seconds read timeout
-        .write_timeout(300)  # 5 minutes write timeout for uploads
-        .connect_timeout(30)  # 30 seconds connect timeout
-        .pool_timeout(30)  # 30 seconds pool timeout
+        .request(request)
+        .get_updates_request(HTTPXRequest(http_version='2'))  # get_updates_* options can't be combined with .request()
+        .concurrent_updates(256)  # handle different users' updates in parallel
         .build()
     )
     
     # Add handlers
     application.add_handler(CommandHandler("start", bot.start))
     application.add_handler(CommandHandler("help", bot.help_command))
-    application.add_handler(CallbackQueryHandler(bot.button_callback))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_url))
+    application.add_handler(CallbackQueryHandler(bot.button_callback, block=False))
+    application.add_handler(MessageHandler(_URL_FILTER, bot.handle_url, block=False))
     
     # Start the bot
     print("Bot is starting...")
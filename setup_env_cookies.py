@@ -5,13 +5,24 @@ This script helps you convert your cookie files to environment variables for sec
 """
 
 import os
+import sys
 from pathlib import Path
+from cookie_utils import present_files, slurp
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+YOUTUBE_COOKIES_PATH = SCRIPT_DIR / "youtube.com_cookies.txt"
+INSTAGRAM_COOKIES_PATH = SCRIPT_DIR / "instagram.com_cookies.txt"
+
+# Newlines become \n and quotes are escaped so the content fits a single-line env var
+_ESC_TABLE = str.maketrans({'\n': '\\n', '"': '\\"'})
 
 def read_cookie_file(file_path):
     """Read and return the content of a cookie file"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        content = slurp(file_path).decode('utf-8')
+        # Normalize line endings like text-mode open() does
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
         return content
     except FileNotFoundError:
         print(f"❌ File not found: {file_path}")
@@ -22,20 +33,22 @@ def read_cookie_file(file_path):
 
 def escape_for_env(content):
     """Escape content for environment variable usage"""
-    # Replace newlines with \n for single-line env var
-    return content.replace('\n', '\\n').replace('"', '\\"')
+    # Cookie jars rarely contain quotes; a plain replace is faster than translate
+    if '"' not in content:
+        return content.replace('\n', '\\n')
+    return content.translate(_ESC_TABLE)
 
 def main():
-    script_dir = Path(__file__).parent
-    youtube_cookies = script_dir / "youtube.com_cookies.txt"
-    instagram_cookies = script_dir / "instagram.com_cookies.txt"
+    names = present_files(SCRIPT_DIR)
+    yt_present = YOUTUBE_COOKIES_PATH.name in names
+    ig_present = INSTAGRAM_COOKIES_PATH.name in names
     
     print("🔐 Cookie File to Environment Variable Converter")
     print("=" * 50)
     
     # Process YouTube cookies
-    if youtube_cookies.exists():
-        youtube_content = read_cookie_file(youtube_cookies)
+    if yt_present:
+        youtube_content = read_cookie_file(YOUTUBE_COOKIES_PATH)
         if youtube_content:
             escaped_youtube = escape_for_env(youtube_content)
             print("\n📺 YouTube Cookies Environment Variable:")
@@ -46,8 +59,8 @@ def main():
         print("⚠️ YouTube cookies file not found")
     
     # Process Instagram cookies
-    if instagram_cookies.exists():
-        instagram_content = read_cookie_file(instagram_cookies)
+    if ig_present:
+        instagram_content = read_cookie_file(INSTAGRAM_COOKIES_PATH)
         if instagram_content:
             escaped_instagram = escape_for_env(instagram_content)
             print("\n📱 Instagram Cookies Environment Variable:")
@@ -57,15 +70,17 @@ def main():
     else:
         print("⚠️ Instagram cookies file not found")
     
-    print("\n" + "=" * 50)
-    print("🚀 Deployment Instructions:")
-    print("1. Copy the environment variables above")
-    print("2. Go to your Render dashboard")
-    print("3. Navigate to your service settings")
-    print("4. Add the environment variables in the 'Environment' section")
-    print("5. Deploy your application")
-    print("\n⚠️ IMPORTANT: Never commit cookie files to Git!")
-    print("   The .gitignore file has been updated to prevent this.")
+    sys.stdout.write("\n".join([
+        "\n" + "=" * 50,
+        "🚀 Deployment Instructions:",
+        "1. Copy the environment variables above",
+        "2. Go to your Render dashboard",
+        "3. Navigate to your service settings",
+        "4. Add the environment variables in the 'Environment' section",
+        "5. Deploy your application",
+        "\n⚠️ IMPORTANT: Never commit cookie files to Git!",
+        "   The .gitignore file has been updated to prevent this.",
+    ]) + "\n")
 
 if __name__ == "__main__":
     main()